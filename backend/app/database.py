@@ -1,10 +1,28 @@
+import atexit
+import functools
+import itertools
 import os
+import shutil
+import tempfile
 from pathlib import Path
+from typing import Dict, Iterable, Optional
 
-from sqlalchemy import Boolean, Column, Integer, String, Text, create_engine, text
+import numpy as np
+import zstandard
+from sqlalchemy import (
+    Column,
+    Integer,
+    LargeBinary,
+    Text,
+    TypeDecorator,
+    create_engine,
+    event,
+    insert,
+)
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import deferred, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 # Create data directory relative to the current file
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -12,81 +30,349 @@ DATA_DIR = BASE_DIR / "data"
 DATA_DIR.mkdir(exist_ok=True)
 
 DB_PATH = DATA_DIR / "summaries.db"
+# Bump whenever init_db gains a migration; stored in PRAGMA user_version.
+SCHEMA_VERSION = 6
+
+if os.getenv("TESTING"):
+    # A throwaway database file in its own temp directory, removed at exit.
+    # It is on disk in WAL mode like the real one, so the read and write pools
+    # see the same isolation (committed snapshots only) as in production.
+    _test_dir = tempfile.mkdtemp(prefix="summaries-test-")
+    atexit.register(shutil.rmtree, _test_dir, ignore_errors=True)
+    DB_PATH = Path(_test_dir) / "summaries.db"
+
 SQLALCHEMY_DATABASE_URL = f"sqlite+aiosqlite:///{DB_PATH}"
+SQLALCHEMY_READ_URL = f"sqlite+aiosqlite:///file:{DB_PATH}?mode=ro&uri=true"
+
+# SQLite only ever admits one writer, so writes queue on a single pooled
+# connection instead of contending for the file lock. Readers get their own
+# read-only pool; under WAL they never block on the writer.
+# Pool sizes can be raised per deployment; pre-ping and recycling are left
+# off, as there is no server connection to go stale.
+READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", max(4, os.cpu_count() or 1)))
+READ_MAX_OVERFLOW = int(os.getenv("DB_READ_MAX_OVERFLOW", 8))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+
+write_engine = create_async_engine(
+    SQLALCHEMY_DATABASE_URL,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=1,
+    max_overflow=0,
+    pool_timeout=POOL_TIMEOUT,
+    insertmanyvalues_page_size=1000,
+    connect_args={"check_same_thread": False},
+)
+read_engine = create_async_engine(
+    SQLALCHEMY_READ_URL,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=READ_POOL_SIZE,
+    max_overflow=READ_MAX_OVERFLOW,
+    pool_timeout=POOL_TIMEOUT,
+    connect_args={"check_same_thread": False},
+)
+WriteSessionLocal = sessionmaker(
+    write_engine, class_=AsyncSession, expire_on_commit=False
+)
+ReadSessionLocal = sessionmaker(
+    read_engine, class_=AsyncSession, expire_on_commit=False
+)
 
-engine = create_async_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+# Per-connection SQLite tuning: WAL lets readers run alongside the writer,
+# NORMAL sync is durable under WAL without an fsync per commit, and the
+# busy timeout makes concurrent writers wait instead of raising SQLITE_BUSY.
+# journal_mode is persisted in the database file, so read-only connections
+# only need the per-connection settings.
+READ_PRAGMAS = (
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA temp_store=memory",
+)
+WRITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    *READ_PRAGMAS,
+    "PRAGMA foreign_keys=ON",
 )
-AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+def _apply_pragmas(dbapi_conn, pragmas):
+    cursor = dbapi_conn.cursor()
+    for pragma in pragmas:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+@event.listens_for(write_engine.sync_engine, "connect")
+def _set_write_pragmas(dbapi_conn, _):
+    _apply_pragmas(dbapi_conn, WRITE_PRAGMAS)
+    # Stop the driver from emitting its own deferred BEGIN; see _begin_immediate.
+    dbapi_conn.isolation_level = None
+
+
+@event.listens_for(write_engine.sync_engine, "begin")
+def _begin_immediate(conn):
+    if conn.get_execution_options().get("isolation_level") == "AUTOCOMMIT":
+        return
+    # Take the write lock up front so a transaction that reads before it
+    # writes can't lose the lock upgrade race and fail with SQLITE_BUSY.
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+@event.listens_for(read_engine.sync_engine, "connect")
+def _set_read_pragmas(dbapi_conn, _):
+    _apply_pragmas(dbapi_conn, READ_PRAGMAS)
+
 
 Base = declarative_base()
 
 
+class IntBoolean(TypeDecorator):
+    """Boolean stored as a plain INTEGER column, as STRICT tables require."""
+
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else int(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else bool(value)
+
+
+class ZstdText(TypeDecorator):
+    """Text stored zstd-compressed in a BLOB column."""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else zstandard.compress(value.encode(), 3)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else zstandard.decompress(value).decode()
+
+
 class SummaryModel(Base):
     __tablename__ = "summaries"
+    __table_args__ = {"sqlite_strict": True}
 
     id = Column(Integer, primary_key=True, index=True)
-    input = Column(Text)
-    output = Column(Text)
+    # The large text columns are only loaded when a query asks for them with
+    # undefer_group("text"); touching them otherwise raises instead of lazily
+    # issuing a second query.
+    input = deferred(Column(ZstdText), group="text", raiseload=True)
+    output = deferred(Column(ZstdText), group="text", raiseload=True)
     num_words = Column(Integer)
-    is_bullet = Column(Boolean)
-    summary_category = Column(String)
+    is_bullet = Column(IntBoolean)
+    summary_category = Column(Text)
     num_bullet_points = Column(Integer, nullable=True)
     instruction = Column(Text, nullable=True)
     instruction_prefix = Column(Text, nullable=True)
     token_length = Column(Integer, nullable=True)
 
 
+class ChatBatchModel(Base):
+    # An upstream Batch API job regenerating summary outputs offline
+    __tablename__ = "chat_batches"
+    __table_args__ = {"sqlite_strict": True}
+
+    id = Column(Text, primary_key=True)
+    status = Column(Text)
+    created_at = Column(Integer)
+    applied = Column(IntBoolean, default=False)
+
+
+# is_bullet -> summary_category -> instruction prefix template, used instead
+# of rendering the prefixes inside SQL. {n} is the number of bullet points.
+INSTRUCTION_PREFIXES: Dict[bool, Dict[str, str]] = {
+    True: {
+        "ultra_concise": "Naredi {n} kraih alinej iz besedila. Naj bodo izjemno kratke in jedrnate.",
+        "concise": "Pretvori besedilo v {n} alinej. Naj bodo kratke in jasne.",
+        "short": "Ustvari {n} alinej iz besedila, z nekoliko več podrobnosti.",
+        "medium": "Naredi {n} alinej iz besedila z zmerno količino podrobnosti.",
+        "long": "Razčleni besedilo v {n} alinej z več podrobnostmi in razširjenimi pojasnili.",
+    },
+    False: {
+        "ultra_concise": "Zgoščeno povzemite glavno idejo v eni sami, osrednji misli. Povzetek naj bo čim krajši.",
+        "concise": "Strnite bistvo v kratke in jedrnate povedi, izpostavljajoč najpomembnejše informacije.",
+        "short": "Napišite kratek povzetek, ki zajame ključne točke in poudari pomembne informacije.",
+        "medium": "Oblikujte povzetek, ki vključuje pomembne podrobnosti in argumente.",
+        "long": "Pripravite obširen povzetek, ki pokriva vse ključne vidike in informacije.",
+    },
+}
+DEFAULT_BULLET_PREFIX = "Razvij {n} alinej iz besedila, pri čemer vključuješ poglobljene informacije in podrobne razlage."
+DEFAULT_PROSE_PREFIX = "Ustvarite temeljit povzetek, ki podrobno povzema vse glavne točke, podatke in zaključke."
+
+
+@functools.lru_cache(maxsize=64)
+def render_instruction_prefix(
+    is_bullet: bool, summary_category: str, num_bullet_points: Optional[int] = None
+) -> str:
+    default = DEFAULT_BULLET_PREFIX if is_bullet else DEFAULT_PROSE_PREFIX
+    template = INSTRUCTION_PREFIXES[bool(is_bullet)].get(summary_category, default)
+    return template.format(n=3 if num_bullet_points is None else num_bullet_points)
+
+
+# Migration statements, built once at import. They go straight to the driver,
+# whose statement cache reuses the prepared statement for the same SQL string.
+_BACKFILL_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS idx_sum_needs_backfill "
+    "ON summaries(id) WHERE instruction_prefix IS NULL"
+)
+_BACKFILL_SELECT_SQL = (
+    "SELECT id, is_bullet, summary_category, num_bullet_points "
+    "FROM summaries WHERE instruction_prefix IS NULL"
+)
+_BACKFILL_UPDATE_SQL = "UPDATE summaries SET instruction_prefix = ? WHERE id = ?"
+# token_length stays NULL (NaN once loaded) for rows that were never measured
+_STATS_SELECT_SQL = (
+    "SELECT COALESCE(num_words, 0), token_length, COALESCE(is_bullet, 0) "
+    "FROM summaries"
+)
+
+
 async def check_and_add_column(conn, table_name, column_name, column_type):
     # Check if column exists
-    try:
-        await conn.execute(text(f"SELECT {column_name} FROM {table_name} LIMIT 1"))
-    except Exception:
-        # Column doesn't exist, add it
-        await conn.execute(
-            text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}")
+    result = await conn.exec_driver_sql(f"PRAGMA table_info({table_name})")
+    columns = {row[1] for row in result.fetchall()}
+    if column_name not in columns:
+        await conn.exec_driver_sql(
+            f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}"
         )
 
 
+async def move_aside_table(conn, table_name, legacy_name):
+    # create_all can't alter a table in place, so a table whose declared
+    # column types changed is renamed out of the way to be recreated
+    result = await conn.exec_driver_sql(f"PRAGMA table_list({table_name})")
+    if result.fetchone() is None:
+        return False
+
+    await conn.exec_driver_sql(f"ALTER TABLE {table_name} RENAME TO {legacy_name}")
+    # Index names are global, so the renamed table's indexes would collide
+    result = await conn.exec_driver_sql(f"PRAGMA index_list({legacy_name})")
+    for index in result.fetchall():
+        if index.origin == "c":
+            await conn.exec_driver_sql(f"DROP INDEX {index.name}")
+    return True
+
+
 async def init_db():
-    async with engine.begin() as conn:
-        # Create tables if they don't exist
-        await conn.run_sync(Base.metadata.create_all)
+    async with write_engine.begin() as conn:
+        # Skip the migrations entirely once this database is up to date
+        version = (await conn.exec_driver_sql("PRAGMA user_version")).scalar()
+        if version >= SCHEMA_VERSION:
+            return
 
-        # Check and add instruction_prefix column if it doesn't exist
-        await check_and_add_column(conn, "summaries", "instruction_prefix", "TEXT")
-
-        # Update existing records to populate instruction_prefix based on is_bullet and summary_category
-        update_sql = text(
-            """
-            UPDATE summaries 
-            SET instruction_prefix = 
-                CASE 
-                    WHEN is_bullet = 1 THEN
-                        CASE summary_category 
-                            WHEN 'ultra_concise' THEN 'Naredi ' || COALESCE(num_bullet_points, '3') || ' kraih alinej iz besedila. Naj bodo izjemno kratke in jedrnate.'
-                            WHEN 'concise' THEN 'Pretvori besedilo v ' || COALESCE(num_bullet_points, '3') || ' alinej. Naj bodo kratke in jasne.'
-                            WHEN 'short' THEN 'Ustvari ' || COALESCE(num_bullet_points, '3') || ' alinej iz besedila, z nekoliko več podrobnosti.'
-                            WHEN 'medium' THEN 'Naredi ' || COALESCE(num_bullet_points, '3') || ' alinej iz besedila z zmerno količino podrobnosti.'
-                            WHEN 'long' THEN 'Razčleni besedilo v ' || COALESCE(num_bullet_points, '3') || ' alinej z več podrobnostmi in razširjenimi pojasnili.'
-                            ELSE 'Razvij ' || COALESCE(num_bullet_points, '3') || ' alinej iz besedila, pri čemer vključuješ poglobljene informacije in podrobne razlage.'
-                        END
-                    ELSE
-                        CASE summary_category 
-                            WHEN 'ultra_concise' THEN 'Zgoščeno povzemite glavno idejo v eni sami, osrednji misli. Povzetek naj bo čim krajši.'
-                            WHEN 'concise' THEN 'Strnite bistvo v kratke in jedrnate povedi, izpostavljajoč najpomembnejše informacije.'
-                            WHEN 'short' THEN 'Napišite kratek povzetek, ki zajame ključne točke in poudari pomembne informacije.'
-                            WHEN 'medium' THEN 'Oblikujte povzetek, ki vključuje pomembne podrobnosti in argumente.'
-                            WHEN 'long' THEN 'Pripravite obširen povzetek, ki pokriva vse ključne vidike in informacije.'
-                            ELSE 'Ustvarite temeljit povzetek, ki podrobno povzema vse glavne točke, podatke in zaključke.'
-                        END
-                END
-            WHERE instruction_prefix IS NULL
-        """
+        # Version 4 made summaries STRICT and version 5 stores input/output
+        # compressed in BLOB columns; older tables are moved aside, brought up
+        # to the current columns, and copied into the recreated table
+        rebuild = version < 5 and await move_aside_table(
+            conn, "summaries", "summaries_legacy"
         )
-        await conn.execute(update_sql)
+        if rebuild:
+            await check_and_add_column(
+                conn, "summaries_legacy", "instruction_prefix", "TEXT"
+            )
+
+        # Create tables if they don't exist (version 6 added chat_batches)
+        await conn.run_sync(Base.metadata.create_all)
+
+        if rebuild:
+            # Re-insert through the table's column types so the text columns
+            # get compressed on the way in
+            table = SummaryModel.__table__
+            columns = ", ".join(c.name for c in table.columns)
+            result = await conn.exec_driver_sql(
+                f"SELECT {columns} FROM summaries_legacy"
+            )
+            for batch in result.mappings().partitions(1000):
+                await conn.execute(table.insert(), [dict(row) for row in batch])
+            await conn.exec_driver_sql("DROP TABLE summaries_legacy")
+
+        # Partial index over rows still missing a prefix; empty once backfilled
+        await conn.exec_driver_sql(_BACKFILL_INDEX_SQL)
+
+        # Populate instruction_prefix for rows that don't have one yet. The
+        # prefixes are rendered in Python and written back in one executemany
+        # instead of evaluating a CASE expression over the whole table.
+        rows = (await conn.exec_driver_sql(_BACKFILL_SELECT_SQL)).fetchall()
+        if rows:
+            params = [
+                (
+                    render_instruction_prefix(
+                        row.is_bullet == 1, row.summary_category, row.num_bullet_points
+                    ),
+                    row.id,
+                )
+                for row in rows
+            ]
+            await conn.exec_driver_sql(_BACKFILL_UPDATE_SQL, params)
+
+        await conn.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+async def shutdown_db():
+    # Refresh planner statistics and fold the WAL back into the database file
+    # so the next boot starts with a small WAL and current statistics. Both
+    # PRAGMAs must run outside a transaction.
+    async with write_engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.exec_driver_sql("PRAGMA optimize")
+        await conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    await read_engine.dispose()
+    await write_engine.dispose()
+
+
+async def bulk_insert_summaries(session, rows: Iterable[dict], chunk_size: int = 1000):
+    # Executemany-style INSERTs in a single transaction, skipping ORM object
+    # construction and unit-of-work bookkeeping per row. Rows are consumed in
+    # chunks so a streamed source never has to be held in memory at once.
+    rows = iter(rows)
+    while chunk := list(itertools.islice(rows, chunk_size)):
+        await session.execute(insert(SummaryModel), chunk)
+    await session.commit()
+
+
+# Column-oriented copy of the numeric summary columns for analytics. Any
+# commit on the writer may change them, so commits drop the cache and bump the
+# generation. The commit event fires before the COMMIT itself runs, so the
+# writer connection's checkin, which comes after it, bumps the generation
+# again; a load that started before the commit was visible is not stored.
+_stats_cache: Dict[str, np.ndarray] = {}
+_stats_generation = 0
+
+
+@event.listens_for(write_engine.sync_engine, "commit")
+@event.listens_for(write_engine.sync_engine, "checkin")
+def _invalidate_stats_cache(*_):
+    global _stats_generation
+    _stats_generation += 1
+    _stats_cache.clear()
+
+
+async def get_summary_stats() -> Dict[str, np.ndarray]:
+    if _stats_cache:
+        return _stats_cache
+    generation = _stats_generation
+    async with read_engine.connect() as conn:
+        result = await conn.exec_driver_sql(_STATS_SELECT_SQL)
+        columns = np.array(result.fetchall(), dtype=np.float64).reshape(-1, 3)
+    stats = {
+        "num_words": columns[:, 0].astype(np.int32),
+        "token_length": columns[:, 1],
+        "is_bullet": columns[:, 2].astype(bool),
+    }
+    if generation == _stats_generation:
+        _stats_cache.update(stats)
+    return stats
+
+
+async def get_db_read():
+    async with ReadSessionLocal() as session:
+        yield session
 
 
-async def get_db():
-    async with AsyncSessionLocal() as session:
+async def get_db_write():
+    async with WriteSessionLocal() as session:
         yield session
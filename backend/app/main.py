@@ -1,26 +1,44 @@
 import asyncio
+import functools
+import hashlib
 import json
 import logging
+import operator
 import os
+import threading
 import time
-from asyncio import Lock
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Optional
 from urllib.parse import urlparse
 
 import classla
 import httpx
-from app.database import AsyncSessionLocal, SummaryModel, get_db, init_db
+import numpy as np
+import redis.asyncio as redis
+import torch
+from app.database import (
+    ChatBatchModel,
+    SummaryModel,
+    WriteSessionLocal,
+    bulk_insert_summaries,
+    get_db_read,
+    get_db_write,
+    get_summary_stats,
+    init_db,
+    render_instruction_prefix,
+    shutdown_db,
+)
 from celery import Celery
 from celery.result import AsyncResult
 from datasets import load_dataset
 from dotenv import load_dotenv
-from fastapi import Depends, FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from openai import OpenAI
-from pydantic import BaseModel, Field
-from sqlalchemy import select
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, field_validator
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from langchain_text_splitters import RecursiveCharacterTextSplitter
@@ -36,7 +54,9 @@ logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-app = FastAPI()
+# orjson renders the large, Unicode-heavy analysis and summary payloads much
+# faster than the stdlib encoder
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Enable CORS
 allowed_origins = [
@@ -49,29 +69,53 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-# Initialize OpenAI client
-logger.info("Initializing OpenAI client")
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
 # Initialize both old and new text processing methods
 # Old direct pipeline
 RESOURCES_DIR = "/root/classla_resources"
 os.environ["STANZA_RESOURCES_DIR"] = RESOURCES_DIR
 
-logger.info(f"Checking for Classla models in {RESOURCES_DIR}")
-# Download models if needed
-if not (Path(RESOURCES_DIR) / "sl").exists():
-    logger.info("Downloading Slovenian language models...")
-    classla.download("sl")
-    logger.info("Model download completed")
-else:
-    logger.info("Slovenian language models already present")
+# Only the processors /analyze-text reads (tokens, UPOS tags, lemmas); the
+# larger batches put more tokens through each tagger/lemmatizer forward pass
+NLP_PIPELINE_OPTIONS = {
+    "processors": "tokenize,pos,lemma",
+    "pos_batch_size": 5000,
+    "lemma_batch_size": 5000,
+}
+
+# The pipeline is built on first use (normally the startup warm-up, on the NLP
+# thread pool) rather than at import, so the app starts without waiting on it
+_nlp = None
+_nlp_lock = threading.Lock()
+
+
+def get_nlp():
+    global _nlp
+    if _nlp is None:
+        with _nlp_lock:
+            if _nlp is None:
+                logger.info(f"Checking for Classla models in {RESOURCES_DIR}")
+                # Download models if needed
+                if not (Path(RESOURCES_DIR) / "sl").exists():
+                    logger.info("Downloading Slovenian language models...")
+                    classla.download("sl")
+                    logger.info("Model download completed")
+                else:
+                    logger.info("Slovenian language models already present")
+
+                logger.info("Initializing Classla pipeline")
+                _nlp = classla.Pipeline("sl", **NLP_PIPELINE_OPTIONS)
+                logger.info("Classla pipeline initialized successfully")
+    return _nlp
+
+
+def annotate(text: str):
+    # inference_mode skips autograd tracking (and version counters) entirely
+    with torch.inference_mode():
+        return get_nlp()(text)
 
-logger.info("Initializing Classla pipeline")
-nlp = classla.Pipeline("sl", processors="tokenize,pos,lemma")
-logger.info("Classla pipeline initialized successfully")
 
 # New Celery pipeline (keep for future use)
 logger.info("Initializing Celery connection")
@@ -80,12 +124,32 @@ celery_app = Celery(
     broker=os.getenv("CELERY_BROKER_URL", "redis://redis:6379/0"),
     backend=os.getenv("CELERY_RESULT_BACKEND", "redis://redis:6379/0"),
 )
+# Must match the worker's serializers in text_processor/tasks.py
+celery_app.conf.update(
+    task_serializer="msgpack",
+    result_serializer="msgpack",
+    accept_content=["msgpack", "json"],
+)
 
 # Add these constants near the top of the file
-OPENAI_API_BASE = "https://api.openai.com/v1/chat/completions"
+OPENAI_API_ROOT = "https://api.openai.com/v1"
+OPENAI_API_BASE = f"{OPENAI_API_ROOT}/chat/completions"
+
+# Prompts for /chat; only the three user slots change per request
+CHAT_SYSTEM_MESSAGE = (
+    "Si pomočnik za urejanje in izboljševanje povzetkov.\n"
+    "Imaš dostop do izvirnega besedila in trenutnega povzetka. "
+    "Zagotovi, da so tvoje spremembe točne glede na izvirno besedilo."
+)
+CHAT_USER_TEMPLATE = (
+    "Izvirno besedilo: {original_text}\n\n"
+    "Trenutni povzetek: {current_summary}\n\n"
+    "Navodilo uporabnika: {message}\n\n"
+    "Prosim, spremeni povzetek v skladu z zgornjim navodilom in ostani zvest "
+    "izvirnemu besedilu. Vrni samo spremenjeni povzetek brez dodatnih pojasnil."
+)
 
 # Add these class variables after app initialization
-app.model_switch_lock = Lock()
 app.current_model = "gpt-3.5-turbo"  # Default model
 
 # Add the Splitter class
@@ -159,50 +223,109 @@ class Splitter:
         
         return processed_chunks
 
+async def warm_up_nlp():
+    # The first pass through the pipeline pays one-off model setup costs
+    try:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(app.state.nlp_pool, annotate, "Testni stavek.")
+        logger.info("Classla pipeline warmed up")
+    except Exception as e:
+        logger.warning(f"Classla warm-up failed: {str(e)}")
+
+
+async def warm_up_upstream():
+    # Opens (and TLS-handshakes) the pooled connection to the default LLM host
+    try:
+        await app.state.http.head(OPENAI_API_BASE, timeout=5.0)
+    except httpx.HTTPError as e:
+        logger.warning(f"Upstream warm-up failed: {str(e)}")
+
+
 @app.on_event("startup")
 async def startup_event():
     logger.info("Application starting up")
+    # One pooled client for every upstream LLM call, so connections (and
+    # their TLS sessions) are kept alive and reused across requests. HTTP/2
+    # multiplexes concurrent streams to the same host over one connection;
+    # servers without it are spoken to over HTTP/1.1.
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        timeout=httpx.Timeout(30.0, connect=10.0),
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+    )
+    # The key only changes with the environment, so the header is built once
+    app.state.api_key = os.getenv("OPENAI_API_KEY")
+    app.state.auth_headers = {"Authorization": f"Bearer {app.state.api_key}"}
+    # Response cache for identical LLM requests; a separate Redis database
+    # from the Celery broker
+    app.state.redis = redis.from_url(
+        os.getenv("REDIS_URL", "redis://redis:6379/1"),
+        socket_connect_timeout=1.0,
+        socket_timeout=1.0,
+    )
+    app.state.nlp_pool = ThreadPoolExecutor(
+        max_workers=max(1, (os.cpu_count() or 1) // 2), thread_name_prefix="nlp"
+    )
+    # Overlap one-time warm-up with database setup; the references keep the
+    # tasks from being garbage collected before they finish
+    app.state.warmup_tasks = [
+        asyncio.create_task(warm_up_nlp()),
+        asyncio.create_task(warm_up_upstream()),
+    ]
     try:
         logger.info("Initializing database")
         await init_db()
         logger.info("Loading initial data")
         await load_initial_data()
+        await get_summary_stats()
         logger.info("Startup completed successfully")
     except Exception as e:
         logger.error(f"Error during startup: {str(e)}", exc_info=True)
         raise
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    logger.info("Application shutting down")
+    await app.state.http.aclose()
+    await app.state.redis.aclose()
+    app.state.nlp_pool.shutdown(wait=False, cancel_futures=True)
+    await shutdown_db()
+
+
 async def load_initial_data():
-    async with AsyncSessionLocal() as session:
+    async with WriteSessionLocal() as session:
         # Check if we already have data
         result = await session.execute(select(SummaryModel).limit(1))
         if result.scalar_one_or_none() is not None:
             return
 
-        # Load from Hugging Face
-        dataset = load_dataset("skadooah2/testiranje_alinej_poglobljeno_test")["train"]
-
-        for item in dataset:
-            instruction_prefix = get_instruction_prefix(
-                is_bullet=item["is_bullet"],
-                summary_category=item["summary_category"],
-                num_bullet_points=item.get("num_bullet_points"),
-            )
-            db_summary = SummaryModel(
-                input=item["input"],
-                output=item["output"],
-                num_words=item["num_words"],
-                is_bullet=item["is_bullet"],
-                summary_category=item["summary_category"],
-                num_bullet_points=item["num_bullet_points"],
-                instruction=item["instruction"],
-                instruction_prefix=instruction_prefix,
-                token_length=item["token_length"],
-            )
-            session.add(db_summary)
+        # Stream from Hugging Face rather than materialising the whole split
+        dataset = load_dataset(
+            "skadooah2/testiranje_alinej_poglobljeno_test",
+            split="train",
+            streaming=True,
+        )
 
-        await session.commit()
+        rows = (
+            {
+                "input": item["input"],
+                "output": item["output"],
+                "num_words": item["num_words"],
+                "is_bullet": item["is_bullet"],
+                "summary_category": item["summary_category"],
+                "num_bullet_points": item["num_bullet_points"],
+                "instruction": item["instruction"],
+                "instruction_prefix": get_instruction_prefix(
+                    is_bullet=item["is_bullet"],
+                    summary_category=item["summary_category"],
+                    num_bullet_points=item.get("num_bullet_points"),
+                ),
+                "token_length": item["token_length"],
+            }
+            for item in dataset
+        )
+        await bulk_insert_summaries(session, rows)
 
 
 class Summary(BaseModel):
@@ -231,35 +354,36 @@ class TextAnalysisRequest(BaseModel):
     summary_text: str
 
 
+@functools.lru_cache(maxsize=512)
+def resolve_endpoint(api_endpoint: str) -> str:
+    """Validate a user-supplied API endpoint and return it without a trailing /."""
+    api_endpoint = api_endpoint.strip()
+    parsed_url = urlparse(api_endpoint)
+    if not (parsed_url.scheme and parsed_url.netloc):
+        raise ValueError(f"Invalid URL format: {api_endpoint}")
+    return api_endpoint.rstrip("/")
+
+
+# Bullet count each category's instruction asks for; the prompt templates
+# themselves live in app.database next to the stored instruction_prefix
+CATEGORY_BULLET_POINTS = {
+    "ultra_concise": 1,
+    "concise": 2,
+    "short": 3,
+    "medium": 4,
+    "long": 5,
+}
+DEFAULT_BULLET_POINTS = 6
+
+
 def get_instruction_prefix(
     is_bullet: bool, summary_category: str, num_bullet_points: Optional[int] = None
 ) -> str:
-    if is_bullet:
-        if summary_category == "ultra_concise":
-            return f"Naredi 1 kraih alinej iz besedila. Naj bodo izjemno kratke in jedrnate."
-        elif summary_category == "concise":
-            return f"Pretvori besedilo v 2 alinej. Naj bodo kratke in jasne."
-        elif summary_category == "short":
-            return f"Ustvari 3 alinej iz besedila, z nekoliko več podrobnosti."
-        elif summary_category == "medium":
-            return f"Naredi 4 alinej iz besedila z zmerno količino podrobnosti."
-        elif summary_category == "long":
-            return f"Razčleni besedilo v 5 alinej z več podrobnostmi in razširjenimi pojasnili."
-        else:
-            return f"Razvij 6 alinej iz besedila, pri čemer vključuješ poglobljene informacije in podrobne razlage."
-    else:
-        if summary_category == "ultra_concise":
-            return "Zgoščeno povzemite glavno idejo v eni sami, osrednji misli. Povzetek naj bo čim krajši."
-        elif summary_category == "concise":
-            return "Strnite bistvo v kratke in jedrnate povedi, izpostavljajoč najpomembnejše informacije."
-        elif summary_category == "short":
-            return "Napišite kratek povzetek, ki zajame ključne točke in poudari pomembne informacije."
-        elif summary_category == "medium":
-            return "Oblikujte povzetek, ki vključuje pomembne podrobnosti in argumente."
-        elif summary_category == "long":
-            return "Pripravite obširen povzetek, ki pokriva vse ključne vidike in informacije."
-        else:
-            return "Ustvarite temeljit povzetek, ki podrobno povzema vse glavne točke, podatke in zaključke."
+    return render_instruction_prefix(
+        is_bullet,
+        summary_category,
+        CATEGORY_BULLET_POINTS.get(summary_category, DEFAULT_BULLET_POINTS),
+    )
 
 
 def getSimilarity(str1: str, str2: str) -> bool:
@@ -274,65 +398,255 @@ def getSimilarity(str1: str, str2: str) -> bool:
             and len(str2) > 3
             and
             # Keep the Levenshtein-like distance for slight spelling variations
-            sum(1 for i in range(min(len(str1), len(str2))) if str1[i] != str2[i])
-            + abs(len(str1) - len(str2))
+            sum(map(operator.ne, str1, str2)) + abs(len(str1) - len(str2))
             <= max(len(str1), len(str2)) * 0.3
         )
     )
 
 
+# Token fields read in the /analyze-text loops, fetched in one C-level call
+_lemma_upos = operator.attrgetter("lemma", "upos")
+_text_lemma_upos = operator.attrgetter("text", "lemma", "upos")
+_SKIP_POS = frozenset({"PUNCT", "SYM", "SPACE"})
+
+
+def process_texts(texts: List[str]) -> list:
+    """Run several texts through the Classla pipeline in one batched pass."""
+    nlp = get_nlp()
+    bulk_process = getattr(nlp, "bulk_process", None)
+    with torch.inference_mode():
+        if bulk_process is None:
+            return [nlp(text) for text in texts]
+        return bulk_process([classla.Document([], text=text) for text in texts])
+
+
+# Lemma sets of recently analysed original texts, keyed by a digest of the
+# text so the cache doesn't keep whole articles alive
+LEMMA_CACHE_SIZE = 256
+_lemma_cache: "OrderedDict[str, frozenset]" = OrderedDict()
+
+
+def text_digest(text: str) -> str:
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def get_cached_lemmas(digest: str) -> Optional[frozenset]:
+    lemmas = _lemma_cache.get(digest)
+    if lemmas is not None:
+        _lemma_cache.move_to_end(digest)
+    return lemmas
+
+
+def cache_lemmas(digest: str, lemmas: frozenset) -> None:
+    _lemma_cache[digest] = lemmas
+    _lemma_cache.move_to_end(digest)
+    if len(_lemma_cache) > LEMMA_CACHE_SIZE:
+        _lemma_cache.popitem(last=False)
+
+
+# Identical upstream payloads are answered from Redis for this many seconds;
+# 0 disables the cache
+CHAT_CACHE_TTL = int(os.getenv("CHAT_CACHE_TTL", "3600"))
+
+
+def chat_cache_key(namespace: str, payload: dict) -> str:
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return f"{namespace}:{text_digest(canonical)}"
+
+
+async def get_cached_response(key: str, ttl: int = CHAT_CACHE_TTL) -> Optional[bytes]:
+    if not ttl:
+        return None
+    try:
+        return await app.state.redis.get(key)
+    except redis.RedisError as e:
+        # The cache is an optimisation; a Redis outage must not fail requests
+        logger.warning(f"Redis cache lookup failed: {str(e)}")
+        return None
+
+
+async def cache_response(key: str, value: bytes, ttl: int = CHAT_CACHE_TTL) -> None:
+    if not ttl:
+        return
+    try:
+        await app.state.redis.setex(key, ttl, value)
+    except redis.RedisError as e:
+        logger.warning(f"Redis cache store failed: {str(e)}")
+
+
+# Original-text lemma sets are also kept in Redis, shared by every worker
+# process and surviving restarts; the in-process LRU above sits in front
+LEMMA_CACHE_TTL = int(os.getenv("LEMMA_CACHE_TTL", "86400"))
+
+
+async def load_original_lemmas(digest: str) -> Optional[frozenset]:
+    lemmas = get_cached_lemmas(digest)
+    if lemmas is None:
+        cached = await get_cached_response(f"lemmas:{digest}", LEMMA_CACHE_TTL)
+        if cached is not None:
+            lemmas = frozenset(json.loads(cached))
+            cache_lemmas(digest, lemmas)
+    return lemmas
+
+
+async def store_original_lemmas(digest: str, lemmas: frozenset) -> None:
+    cache_lemmas(digest, lemmas)
+    await cache_response(
+        f"lemmas:{digest}",
+        json.dumps(list(lemmas), ensure_ascii=False).encode(),
+        LEMMA_CACHE_TTL,
+    )
+
+
 @app.get("/summaries/", response_model=List[Summary])
 async def get_summaries(
-    skip: int = 0, limit: int = 10, db: AsyncSession = Depends(get_db)
+    response: Response,
+    skip: int = 0,
+    limit: int = 10,
+    after_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db_read),
 ):
     try:
-        query = select(SummaryModel).offset(skip).limit(limit)
-        result = await db.execute(query)
-        summaries = result.scalars().all()
-
-        if not summaries:
-            return []
-
-        return [
-            Summary(
-                id=summary.id,
-                input=summary.input,
-                output=summary.output,
-                num_words=summary.num_words,
-                is_bullet=summary.is_bullet,
-                summary_category=summary.summary_category,
-                instruction=summary.instruction,
-                instruction_prefix=summary.instruction_prefix,
-                token_length=summary.token_length,
-            )
-            for summary in summaries
-        ]
+        # Plain column rows straight into the response model; no ORM objects
+        query = select(
+            SummaryModel.id,
+            SummaryModel.input,
+            SummaryModel.output,
+            SummaryModel.num_words,
+            SummaryModel.is_bullet,
+            SummaryModel.summary_category,
+            SummaryModel.instruction,
+            SummaryModel.instruction_prefix,
+            SummaryModel.token_length,
+        )
+        if after_id is not None:
+            # Keyset pagination: a primary key range seek, so deep pages cost
+            # the same as the first instead of scanning past OFFSET rows
+            query = query.where(SummaryModel.id > after_id).order_by(SummaryModel.id)
+        else:
+            query = query.offset(skip)
+        result = await db.execute(query.limit(limit))
+        summaries = [Summary.model_validate(row) for row in result.mappings().all()]
+
+        # Cursor for the following page, passed back as after_id
+        if summaries:
+            response.headers["X-Next-Cursor"] = str(summaries[-1].id)
+        return summaries
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/summaries/stats")
+async def get_summaries_stats():
+    try:
+        stats = await get_summary_stats()
+        num_words = stats["num_words"]
+        # Rows without a measured token length are NaN and left out
+        token_length = stats["token_length"]
+        token_length = token_length[~np.isnan(token_length)]
+
+        if not num_words.size:
+            return {"count": 0}
+
+        return {
+            "count": int(num_words.size),
+            "bullet_count": int(stats["is_bullet"].sum()),
+            "num_words_mean": float(num_words.mean()),
+            "num_words_median": float(np.median(num_words)),
+            "token_length_mean": (
+                float(token_length.mean()) if token_length.size else None
+            ),
+            "token_length_max": int(token_length.max()) if token_length.size else None,
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.put("/summaries/{summary_id}")
 async def update_summary(
-    summary_id: int, update_data: SummaryUpdate, db: AsyncSession = Depends(get_db)
+    summary_id: int,
+    update_data: SummaryUpdate,
+    db: AsyncSession = Depends(get_db_write),
 ):
     try:
-        query = select(SummaryModel).where(SummaryModel.id == summary_id)
-        result = await db.execute(query)
-        summary = result.scalar_one_or_none()
+        # A single UPDATE by primary key; the row is never loaded
+        result = await db.execute(
+            update(SummaryModel)
+            .where(SummaryModel.id == summary_id)
+            .values(output=update_data.summary)
+            .execution_options(synchronize_session=False)
+        )
 
-        if not summary:
+        if not result.rowcount:
             raise HTTPException(status_code=404, detail="Summary not found")
 
-        summary.output = update_data.summary
         await db.commit()
 
         return {"message": "Summary updated successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def build_chat_payload(original_text: str, current_summary: str, message: str) -> dict:
+    return {
+        "model": "gpt-3.5-turbo",
+        "messages": [
+            {"role": "system", "content": CHAT_SYSTEM_MESSAGE},
+            {
+                "role": "user",
+                "content": CHAT_USER_TEMPLATE.format(
+                    original_text=original_text,
+                    current_summary=current_summary,
+                    message=message,
+                ),
+            },
+        ],
+        "temperature": 0.7,
+        "max_tokens": 1000,
+    }
+
+
+# Upstream /chat completions currently running, by cache key
+_inflight_chats: Dict[str, asyncio.Task] = {}
+
+
+async def request_chat_completion(cache_key: str, payload: dict) -> str:
+    # Plain async POST on the shared client; the sync SDK call blocked the
+    # event loop for the whole OpenAI round-trip
+    logger.debug("Sending request to OpenAI")
+    response = await app.state.http.post(
+        OPENAI_API_BASE,
+        json=payload,
+        headers=app.state.auth_headers,
+        # Completions can take minutes; keep the SDK's 600s instead of the
+        # client's default read timeout
+        timeout=600.0,
+    )
+    response.raise_for_status()
+    data = response.json()
+
+    updated_summary = data["choices"][0]["message"]["content"].strip()
+    await cache_response(cache_key, updated_summary.encode())
+    return updated_summary
+
+
+def coalesced_chat_completion(cache_key: str, payload: dict) -> asyncio.Task:
+    # Chat prompts differ per user and can't share one completion call, but
+    # identical ones (double submits, retries) can share one in-flight call.
+    # Callers await it shielded, so one client disconnecting doesn't cancel
+    # the call for the others.
+    task = _inflight_chats.get(cache_key)
+    if task is None:
+        task = asyncio.create_task(request_chat_completion(cache_key, payload))
+        _inflight_chats[cache_key] = task
+        task.add_done_callback(lambda _: _inflight_chats.pop(cache_key, None))
+    return task
+
+
 @app.post("/chat")
-async def process_chat(chat_request: dict, db: AsyncSession = Depends(get_db)):
+async def process_chat(chat_request: dict, db: AsyncSession = Depends(get_db_read)):
     start_time = time.time()
     message = chat_request.get("message")
     current_summary = chat_request.get("current_summary")
@@ -344,29 +658,18 @@ async def process_chat(chat_request: dict, db: AsyncSession = Depends(get_db)):
     )
 
     try:
-        system_message = """Si pomočnik za urejanje in izboljševanje povzetkov. 
-        Imaš dostop do izvirnega besedila in trenutnega povzetka. Zagotovi, da so tvoje spremembe točne glede na izvirno besedilo."""
-
-        user_prompt = f"""Izvirno besedilo: {original_text}
-
-Trenutni povzetek: {current_summary}
-
-Navodilo uporabnika: {message}
+        payload = build_chat_payload(original_text, current_summary, message)
 
-Prosim, spremeni povzetek v skladu z zgornjim navodilom in ostani zvest izvirnemu besedilu. Vrni samo spremenjeni povzetek brez dodatnih pojasnil."""
+        cache_key = chat_cache_key("chat", payload)
+        cached = await get_cached_response(cache_key)
+        if cached is not None:
+            logger.info("Chat response served from cache")
+            return {"updated_summary": cached.decode()}
 
-        logger.debug("Sending request to OpenAI")
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=0.7,
-            max_tokens=1000,
+        # Identical requests already in flight share one upstream call
+        updated_summary = await asyncio.shield(
+            coalesced_chat_completion(cache_key, payload)
         )
-
-        updated_summary = response.choices[0].message.content.strip()
         processing_time = time.time() - start_time
         logger.info(f"Chat processing completed in {processing_time:.2f} seconds")
         logger.debug(f"Generated summary length: {len(updated_summary)}")
@@ -388,49 +691,68 @@ async def analyze_text(request: dict):
     )
 
     try:
-        # Use the direct pipeline instead of Celery
-        logger.debug("Processing original text...")
-        doc_original = nlp(original_text)
-        logger.debug("Original text processing completed")
-
-        logger.debug("Processing summary text...")
-        doc_summary = nlp(summary_text)
-        logger.debug("Summary text processing completed")
-
-        # Extract lemmas from original text
-        logger.debug("Extracting lemmas from original text...")
-        original_lemmas = {
-            word.lemma.lower()
-            for sent in doc_original.sentences
-            for word in sent.words
-            if word.upos not in ["PUNCT", "SYM", "SPACE"]
-        }
-        logger.debug(
-            f"Extracted {len(original_lemmas)} unique lemmas from original text"
-        )
+        # Classla is CPU-bound and blocking; it runs on the NLP thread pool so
+        # the event loop keeps serving other requests meanwhile
+        loop = asyncio.get_running_loop()
+
+        # The same original text is re-sent on every summary edit, so its
+        # lemma set is cached and only the summary is re-parsed
+        original_digest = text_digest(original_text)
+        original_lemmas = await load_original_lemmas(original_digest)
+        if original_lemmas is None:
+            # Use the direct pipeline instead of Celery, with both texts in
+            # a single pipeline pass
+            logger.debug("Processing original and summary text...")
+            doc_original, doc_summary = await loop.run_in_executor(
+                app.state.nlp_pool, process_texts, [original_text, summary_text]
+            )
+            logger.debug("Text processing completed")
+
+            # Extract lemmas from original text
+            logger.debug("Extracting lemmas from original text...")
+            original_lemmas = frozenset(
+                lemma.lower()
+                for sent in doc_original.sentences
+                for lemma, upos in map(_lemma_upos, sent.words)
+                if upos not in _SKIP_POS
+            )
+            await store_original_lemmas(original_digest, original_lemmas)
+            logger.debug(
+                f"Extracted {len(original_lemmas)} unique lemmas from original text"
+            )
+        else:
+            logger.debug("Using cached lemmas for original text")
+            logger.debug("Processing summary text...")
+            doc_summary = await loop.run_in_executor(
+                app.state.nlp_pool, annotate, summary_text
+            )
+            logger.debug("Summary text processing completed")
 
         # Analyze summary words
         logger.debug("Analyzing summary words...")
-        summary_analysis = []
-        for sent in doc_summary.sentences:
-            for word in sent.words:
-                if word.upos in ["PUNCT", "SYM", "SPACE"]:
-                    continue
-
-                analysis = {
-                    "word": word.text,
-                    "lemma": word.lemma.lower(),
-                    "found_in_original": word.lemma.lower() in original_lemmas,
-                    "pos": word.upos,
-                }
-                summary_analysis.append(analysis)
+        tokens = [
+            (text, lemma.lower(), upos)
+            for sent in doc_summary.sentences
+            for text, lemma, upos in map(_text_lemma_upos, sent.words)
+            if upos not in _SKIP_POS
+        ]
+        words, lemmas, tags = map(list, zip(*tokens)) if tokens else ([], [], [])
 
         processing_time = time.time() - start_time
         logger.info(
-            f"Analysis completed in {processing_time:.2f} seconds. Analyzed {len(summary_analysis)} words"
+            f"Analysis completed in {processing_time:.2f} seconds. Analyzed {len(words)} words"
         )
 
-        return {"analysis": summary_analysis}
+        # Parallel columns instead of one object per word: each key is sent
+        # once rather than once per word; entry i of every list is word i
+        return {
+            "analysis": {
+                "words": words,
+                "lemmas": lemmas,
+                "found_in_original": [lemma in original_lemmas for lemma in lemmas],
+                "pos": tags,
+            }
+        }
     except Exception as e:
         logger.error(f"Error in text analysis: {str(e)}", exc_info=True)
         logger.error(
@@ -454,6 +776,17 @@ async def analyze_text_async(request: TextAnalysisRequest):
     }
 
 
+@app.post("/analyze-text-pair")
+async def analyze_text_pair(request: TextAnalysisRequest):
+    # Both parses and the lemma comparison run in one worker task; poll
+    # /task-status/{task_id} for the same columns /analyze-text returns
+    task = celery_app.send_task(
+        "tasks.analyze_pair", args=[request.original_text, request.summary_text]
+    )
+
+    return {"task_id": task.id}
+
+
 @app.get("/task-status/{task_id}")
 async def get_task_status(task_id: str):
     result = AsyncResult(task_id)
@@ -473,18 +806,27 @@ async def get_analysis_results(task_ids: dict):
     original_results = original_result.get()
     summary_results = summary_result.get()
 
+    # Exact lemma matches are a hash probe; only unmatched lemmas fall back to
+    # the fuzzy scan, over unique original lemmas and once per summary lemma
+    original_lemmas = set(original_results["lemmas"])
+    matches = {}
+
     # Process results and create analysis
     analysis = []
-    for word_info in summary_results:
-        found = any(
-            getSimilarity(word_info["lemma"], orig["lemma"])
-            for orig in original_results
-        )
+    for word, lemma, pos in zip(
+        summary_results["words"], summary_results["lemmas"], summary_results["pos"]
+    ):
+        found = matches.get(lemma)
+        if found is None:
+            found = lemma in original_lemmas or any(
+                getSimilarity(lemma, orig) for orig in original_lemmas
+            )
+            matches[lemma] = found
         analysis.append(
             {
-                "word": word_info["word"],
-                "lemma": word_info["lemma"],
-                "pos": word_info["pos"],
+                "word": word,
+                "lemma": lemma,
+                "pos": pos,
                 "found_in_original": found,
             }
         )
@@ -493,11 +835,9 @@ async def get_analysis_results(task_ids: dict):
 
 
 @app.get("/summaries/{summary_id}/parameters")
-async def get_parameters(summary_id: int, db: AsyncSession = Depends(get_db)):
+async def get_parameters(summary_id: int, db: AsyncSession = Depends(get_db_read)):
     try:
-        query = select(SummaryModel).where(SummaryModel.id == summary_id)
-        result = await db.execute(query)
-        summary = result.scalar_one_or_none()
+        summary = await db.get(SummaryModel, summary_id)
 
         if not summary:
             raise HTTPException(status_code=404, detail="Summary not found")
@@ -512,12 +852,10 @@ async def get_parameters(summary_id: int, db: AsyncSession = Depends(get_db)):
 
 @app.put("/summaries/{summary_id}/parameters")
 async def update_parameters(
-    summary_id: int, params: Parameters, db: AsyncSession = Depends(get_db)
+    summary_id: int, params: Parameters, db: AsyncSession = Depends(get_db_write)
 ):
     try:
-        query = select(SummaryModel).where(SummaryModel.id == summary_id)
-        result = await db.execute(query)
-        summary = result.scalar_one_or_none()
+        summary = await db.get(SummaryModel, summary_id)
 
         if not summary:
             raise HTTPException(status_code=404, detail="Summary not found")
@@ -554,8 +892,10 @@ class ChatRequest(BaseModel):
 @app.post("/api/chat")
 async def generate_chat_response(request: ChatRequest):
     try:                
-        api_endpoint = request.api_endpoint or OPENAI_API_BASE
-        api_endpoint = api_endpoint.rstrip("/") + "/v1/chat/completions"
+        api_endpoint = (
+            resolve_endpoint(request.api_endpoint or OPENAI_API_BASE)
+            + "/v1/chat/completions"
+        )
         # Log the incoming request details
         logger.info("Received chat request:")
         logger.info(f"Input text: {request.input_text}")
@@ -564,56 +904,68 @@ async def generate_chat_response(request: ChatRequest):
         splitter = Splitter()
         chunks = splitter.split(request.input_text)
 
+        if not app.state.api_key:
+            logger.error("OpenAI API key not found in environment variables")
+            raise HTTPException(status_code=500, detail="OpenAI API key not configured")
+
+        # Everything except the message is the same for every chunk, so the
+        # payload and prefix are built once per request
+        instruction_prefix = get_instruction_prefix(
+            request.is_bullet, request.summary_category
+        )
+        base_payload = {
+            "model": app.current_model,
+            "temperature": request.temperature,
+            "max_tokens": request.max_tokens,
+            "top_k": request.top_k,
+            "top_p": request.top_p,
+            "frequency_penalty": request.frequency_penalty,
+            "stream": True,  # Enable streaming
+        }
+
         async def generate():
             for chunk in chunks:
-                # Prepare the OpenAI-compatible payload with the provided parameters
-                instruction_prefix = get_instruction_prefix(request.is_bullet, request.summary_category)
-                
                 payload = {
-                    "model": app.current_model,
+                    **base_payload,
                     "messages": [
-                        {
-                            "role": "user",
-                            "content": f"{instruction_prefix}\n{chunk}",
-                        }
+                        {"role": "user", "content": f"{instruction_prefix}\n{chunk}"}
                     ],
-                    "temperature": request.temperature,
-                    "max_tokens": request.max_tokens,
-                    "top_k": request.top_k,
-                    "top_p": request.top_p,
-                    "frequency_penalty": request.frequency_penalty,
-                    "stream": True,  # Enable streaming
-                }
-
-                api_key = os.getenv("OPENAI_API_KEY")
-                if not api_key:
-                    logger.error("OpenAI API key not found in environment variables")
-                    raise HTTPException(status_code=500, detail="OpenAI API key not configured")
-
-                headers = {
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {api_key}",
                 }
 
+                cache_key = chat_cache_key("chat:stream", payload)
+                cached = await get_cached_response(cache_key)
+                if cached is not None:
+                    logger.info("Chat stream served from cache")
+                    yield cached
+                    continue
 
                 logger.info("Starting streaming request to OpenAI API")
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    async with client.stream(
-                        "POST",
-                        api_endpoint,
-                        json=payload,
-                        headers=headers,
-                    ) as response:
-                        if response.status_code != 200:
-                            error_msg = await response.text()  # Read the error message
-                            logger.error(f"API Error: {error_msg}")
-                            yield f"data: {json.dumps({'error': f'API Error: {error_msg}'})}\n\n"
-                            return
-
-                        logger.info("Successfully connected to API, starting stream")
-                        async for line in response.aiter_lines():
-                            if line and line.startswith("data: "):
-                                yield f"{line}\n\n"
+                async with app.state.http.stream(
+                    "POST",
+                    api_endpoint,
+                    json=payload,
+                    headers=app.state.auth_headers,
+                ) as response:
+                    if response.status_code != 200:
+                        await response.aread()  # Read the error message
+                        error_msg = response.text
+                        logger.error(f"API Error: {error_msg}")
+                        yield f"data: {json.dumps({'error': f'API Error: {error_msg}'})}\n\n"
+                        return
+
+                    logger.info(
+                        f"Successfully connected to API over {response.http_version}, "
+                        "starting stream"
+                    )
+                    # The upstream already frames its events as SSE, so bytes
+                    # are relayed as they arrive without decoding or re-framing
+                    # The relayed bytes are kept so a completed stream can be
+                    # replayed from the cache; an aborted one never reaches it
+                    streamed = []
+                    async for data in response.aiter_bytes():
+                        streamed.append(data)
+                        yield data
+                    await cache_response(cache_key, b"".join(streamed))
 
         logger.info("Initiating streaming response")
         return StreamingResponse(
@@ -640,35 +992,23 @@ class ModelsRequest(BaseModel):
 @app.post("/api/models")
 async def get_models(request: ModelsRequest):
     try:
-        api_endpoint = request.api_endpoint.strip()
-        logger.info(f"Original API endpoint: {api_endpoint}")
-
-        # Basic URL validation
-        from urllib.parse import urlparse
-
-        parsed_url = urlparse(api_endpoint)
-        if not all([parsed_url.scheme, parsed_url.netloc]):
-            raise ValueError(f"Invalid URL format: {api_endpoint}")
-
-        to_call = f"{api_endpoint.rstrip('/')}/models"
+        logger.info(f"Original API endpoint: {request.api_endpoint}")
+        to_call = f"{resolve_endpoint(request.api_endpoint)}/models"
         logger.info(f"Making request to: {to_call}")
 
-        async with httpx.AsyncClient(verify=True) as client:
-            response = await client.get(
-                to_call,
-                headers={"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}"},
-                timeout=30.0,
-            )
+        response = await app.state.http.get(
+            to_call,
+            headers=app.state.auth_headers,
+            timeout=30.0,
+        )
 
-            if response.status_code != 200:
-                logger.error(f"Failed to fetch models: {response.text}")
-                raise HTTPException(
-                    status_code=response.status_code, detail=response.text
-                )
+        if response.status_code != 200:
+            logger.error(f"Failed to fetch models: {response.text}")
+            raise HTTPException(status_code=response.status_code, detail=response.text)
 
-            data = response.json()
-            logger.info(f"Successfully retrieved models data")
-            return data
+        data = response.json()
+        logger.info(f"Successfully retrieved models data")
+        return data
 
     except ValueError as e:
         logger.error(f"URL validation error: {str(e)}")
@@ -685,62 +1025,58 @@ class ModelSwitchRequest(BaseModel):
 
 @app.post("/switch_model")
 async def switch_model(request: ModelSwitchRequest):
+    # Switches are last-writer-wins: concurrent switches are not rejected, and
+    # current_model ends up as whichever one reports success last
     try:
-        if app.model_switch_lock.locked():
-            raise HTTPException(
-                status_code=409,
-                detail="Model switch already in progress. Please try again later.",
-            )
+        if not request.api_endpoint:
+            raise ValueError("API endpoint is required")
 
-        async with app.model_switch_lock:
-            if not request.api_endpoint:
-                raise ValueError("API endpoint is required")
-
-            api_endpoint = request.api_endpoint.strip()
-            switch_url = f"{api_endpoint.rstrip('/')}/switch_model/{request.model_name}"
-
-            async def generate():
-                try:
-                    async with httpx.AsyncClient(verify=True, timeout=120.0) as client:
-                        async with client.stream(
-                            "POST",
-                            switch_url,
-                            headers={
-                                "Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}"
-                            },
-                        ) as response:
-                            if response.status_code != 200:
-                                error_msg = await response.text()
-                                yield f"data: {json.dumps({'error': error_msg})}\n\n"
-                                return
-
-                            # Pass through the streaming response
-                            async for line in response.aiter_lines():
-                                if line:
-                                    # Forward the SSE line as-is
-                                    yield f"{line}\n\n"
-
-                                    # Update current model if success message received
-                                    try:
-                                        if line.startswith("data: "):
-                                            data = json.loads(line[6:])
-                                            if data.get("status") == "success":
-                                                app.current_model = request.model_name
-                                    except json.JSONDecodeError:
-                                        continue
-
-                except Exception as e:
-                    logger.error(f"Error during model switch: {str(e)}")
-                    yield f"data: {json.dumps({'error': str(e)})}\n\n"
-
-            return StreamingResponse(
-                generate(),
-                media_type="text/event-stream",
-                headers={
-                    "Cache-Control": "no-cache",
-                    "Connection": "keep-alive",
-                },
-            )
+        api_endpoint = resolve_endpoint(request.api_endpoint)
+        switch_url = f"{api_endpoint}/switch_model/{request.model_name}"
+
+        async def generate():
+            try:
+                async with app.state.http.stream(
+                    "POST",
+                    switch_url,
+                    headers=app.state.auth_headers,
+                    timeout=120.0,
+                ) as response:
+                    if response.status_code != 200:
+                        await response.aread()
+                        yield f"data: {json.dumps({'error': response.text})}\n\n"
+                        return
+
+                    # Pass the stream through byte-for-byte, keeping only the
+                    # unterminated tail to scan complete lines for the marker
+                    tail = b""
+                    async for chunk in response.aiter_bytes():
+                        yield chunk
+
+                        *lines, tail = (tail + chunk).split(b"\n")
+                        for line in lines:
+                            # Update current model if success message received
+                            if not line.startswith(b"data: "):
+                                continue
+                            try:
+                                data = json.loads(line[6:])
+                            except json.JSONDecodeError:
+                                continue
+                            if data.get("status") == "success":
+                                app.current_model = request.model_name
+
+            except Exception as e:
+                logger.error(f"Error during model switch: {str(e)}")
+                yield f"data: {json.dumps({'error': str(e)})}\n\n"
+
+        return StreamingResponse(
+            generate(),
+            media_type="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                "Connection": "keep-alive",
+            },
+        )
 
     except Exception as e:
         logger.error(f"Error in switch_model: {str(e)}", exc_info=True)
@@ -760,37 +1096,206 @@ async def get_current_model(request: ModelInfoRequest) -> Dict[str, str]:
     """Get current model info from LLM service."""
     try:
         # Validate URL
-        url = request.api_endpoint.strip()
-        if not all([x for x in urlparse(url)[0:2]]):
+        try:
+            url = resolve_endpoint(request.api_endpoint)
+        except ValueError:
             raise HTTPException(status_code=400, detail="Invalid URL")
 
         # Make request with increased timeout and better error handling
-        async with httpx.AsyncClient(
-            timeout=httpx.Timeout(30.0, connect=10.0)
-        ) as client:
-            try:
-                response = await client.get(
-                    f"{url.rstrip('/')}/current_model",
-                    headers={"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}"},
-                )
-                response.raise_for_status()
-                return response.json()
-            except httpx.TimeoutException:
-                logger.error(f"Timeout while connecting to LLM service at {url}")
-                raise HTTPException(
-                    status_code=504, detail="Timeout while connecting to LLM service"
-                )
-            except httpx.ConnectError:
-                logger.error(f"Failed to connect to LLM service at {url}")
-                raise HTTPException(
-                    status_code=503, detail="Could not connect to LLM service"
-                )
+        try:
+            response = await app.state.http.get(
+                f"{url}/current_model",
+                headers=app.state.auth_headers,
+                timeout=httpx.Timeout(30.0, connect=10.0),
+            )
+            response.raise_for_status()
+            return response.json()
+        except httpx.TimeoutException:
+            logger.error(f"Timeout while connecting to LLM service at {url}")
+            raise HTTPException(
+                status_code=504, detail="Timeout while connecting to LLM service"
+            )
+        except httpx.ConnectError:
+            logger.error(f"Failed to connect to LLM service at {url}")
+            raise HTTPException(
+                status_code=503, detail="Could not connect to LLM service"
+            )
 
     except httpx.HTTPError as e:
         logger.error(f"LLM service error: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch model info")
 
 
+class ChatBatchItem(BaseModel):
+    summary_id: int
+    message: str
+
+
+class ChatBatchRequest(BaseModel):
+    items: List[ChatBatchItem] = Field(min_length=1)
+
+    @field_validator("items")
+    @classmethod
+    def unique_summary_ids(cls, items: List[ChatBatchItem]) -> List[ChatBatchItem]:
+        # custom_id is the summary id, so it has to be unique within a batch
+        ids = [item.summary_id for item in items]
+        if len(ids) != len(set(ids)):
+            raise ValueError("Each summary_id may appear only once per batch")
+        return items
+
+
+@app.post("/chat/batch")
+async def create_chat_batch(
+    request: ChatBatchRequest, db: AsyncSession = Depends(get_db_read)
+):
+    """Queue bulk summary edits as an upstream Batch API job.
+
+    Batch jobs finish within 24 hours at a lower price than realtime calls,
+    which suits operator-driven bulk regeneration; /chat stays interactive.
+    """
+    try:
+        ids = {item.summary_id for item in request.items}
+        query = select(SummaryModel.id, SummaryModel.input, SummaryModel.output).where(
+            SummaryModel.id.in_(ids)
+        )
+        summaries = {row.id: row for row in (await db.execute(query)).all()}
+        # Release the read connection before the slow upstream calls
+        await db.rollback()
+        missing = ids - summaries.keys()
+        if missing:
+            raise HTTPException(
+                status_code=404, detail=f"Summaries not found: {sorted(missing)}"
+            )
+
+        # One JSONL request line per edit; custom_id routes the result back
+        lines = []
+        for item in request.items:
+            summary = summaries[item.summary_id]
+            lines.append(
+                json.dumps(
+                    {
+                        "custom_id": str(item.summary_id),
+                        "method": "POST",
+                        "url": "/v1/chat/completions",
+                        "body": build_chat_payload(
+                            summary.input, summary.output, item.message
+                        ),
+                    },
+                    ensure_ascii=False,
+                )
+            )
+
+        response = await app.state.http.post(
+            f"{OPENAI_API_ROOT}/files",
+            headers=app.state.auth_headers,
+            data={"purpose": "batch"},
+            files={"file": ("chat_batch.jsonl", "\n".join(lines).encode())},
+            timeout=120.0,
+        )
+        response.raise_for_status()
+        input_file_id = response.json()["id"]
+
+        response = await app.state.http.post(
+            f"{OPENAI_API_ROOT}/batches",
+            headers=app.state.auth_headers,
+            json={
+                "input_file_id": input_file_id,
+                "endpoint": "/v1/chat/completions",
+                "completion_window": "24h",
+            },
+        )
+        response.raise_for_status()
+        batch = response.json()
+
+        # The single writer connection is only taken once the upstream calls
+        # are done, so other writes never queue behind them
+        async with WriteSessionLocal() as session:
+            session.add(
+                ChatBatchModel(
+                    id=batch["id"], status=batch["status"], created_at=int(time.time())
+                )
+            )
+            await session.commit()
+        logger.info(f"Submitted chat batch {batch['id']} with {len(lines)} requests")
+        return {"batch_id": batch["id"], "status": batch["status"]}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error submitting chat batch: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/chat/batch/{batch_id}")
+async def get_chat_batch(batch_id: str, db: AsyncSession = Depends(get_db_read)):
+    """Report a batch's status, writing its outputs back once it completes."""
+    try:
+        query = select(ChatBatchModel.status, ChatBatchModel.applied).where(
+            ChatBatchModel.id == batch_id
+        )
+        chat_batch = (await db.execute(query)).first()
+        # Release the read connection before the slow upstream calls
+        await db.rollback()
+        if not chat_batch:
+            raise HTTPException(status_code=404, detail="Batch not found")
+        if chat_batch.applied:
+            return {"batch_id": batch_id, "status": chat_batch.status}
+
+        response = await app.state.http.get(
+            f"{OPENAI_API_ROOT}/batches/{batch_id}", headers=app.state.auth_headers
+        )
+        response.raise_for_status()
+        batch = response.json()
+
+        result = {"batch_id": batch_id, "status": batch["status"]}
+        updates = []
+        applied = False
+        if batch["status"] == "completed" and batch.get("output_file_id"):
+            response = await app.state.http.get(
+                f"{OPENAI_API_ROOT}/files/{batch['output_file_id']}/content",
+                headers=app.state.auth_headers,
+                timeout=120.0,
+            )
+            response.raise_for_status()
+
+            failed = 0
+            for line in response.text.splitlines():
+                if not line:
+                    continue
+                entry = json.loads(line)
+                batch_response = entry.get("response") or {}
+                if batch_response.get("status_code") != 200:
+                    failed += 1
+                    continue
+                body = batch_response["body"]
+                updates.append(
+                    {
+                        "id": int(entry["custom_id"]),
+                        "output": body["choices"][0]["message"]["content"].strip(),
+                    }
+                )
+            applied = True
+            result.update(updated=len(updates), failed=failed)
+
+        # Short write transaction once every upstream call has finished
+        async with WriteSessionLocal() as session:
+            # Bulk UPDATE by primary key, one executemany for the whole batch
+            if updates:
+                await session.execute(update(SummaryModel), updates)
+            await session.execute(
+                update(ChatBatchModel)
+                .where(ChatBatchModel.id == batch_id)
+                .values(status=batch["status"], applied=applied)
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error polling chat batch: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 class CancelRequest(BaseModel):
     api_endpoint: str
     request_id: str
@@ -799,30 +1304,26 @@ class CancelRequest(BaseModel):
 @app.post("/chat/cancel")
 async def cancel_chat(request: CancelRequest):
     try:
-        api_endpoint = request.api_endpoint.strip()
-        cancel_url = f"{api_endpoint.rstrip('/')}/cancel"
+        cancel_url = f"{resolve_endpoint(request.api_endpoint)}/cancel"
 
         logger.info(f"Attempting to cancel request {request.request_id}")
 
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(
-                cancel_url,
-                headers={
-                    "Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}",
-                    "Content-Type": "application/json",
-                },
-                json={"request_id": request.request_id},
-            )
+        response = await app.state.http.post(
+            cancel_url,
+            headers=app.state.auth_headers,
+            json={"request_id": request.request_id},
+            timeout=10.0,
+        )
 
-            if response.status_code != 200:
-                logger.error(f"Failed to cancel request: {response.text}")
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"Failed to cancel request: {response.text}",
-                )
+        if response.status_code != 200:
+            logger.error(f"Failed to cancel request: {response.text}")
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=f"Failed to cancel request: {response.text}",
+            )
 
-            logger.info(f"Successfully cancelled request {request.request_id}")
-            return response.json()
+        logger.info(f"Successfully cancelled request {request.request_id}")
+        return response.json()
 
     except httpx.TimeoutException:
         logger.error("Timeout while attempting to cancel request")
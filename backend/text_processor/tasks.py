@@ -1,6 +1,8 @@
 import logging
 from celery import Celery
+from celery.signals import worker_init
 import classla
+import torch
 import os
 from pathlib import Path
 import time
@@ -26,33 +28,55 @@ os.environ['STANZA_RESOURCES_DIR'] = RESOURCES_DIR
 os.makedirs(RESOURCES_DIR, exist_ok=True)
 
 logger.info(f"Using resources directory: {RESOURCES_DIR}")
-logger.info(f"Directory contents before check: {os.listdir(RESOURCES_DIR)}")
 
-# Check for Slovenian model specifically
-sl_model_path = Path(RESOURCES_DIR) / 'sl'
-if not sl_model_path.exists():
-    logger.info("Slovenian model not found, downloading...")
-    try:
-        classla.download('sl', dir=RESOURCES_DIR)
-        logger.info("Model download completed")
-    except Exception as e:
-        logger.error(f"Error downloading model: {str(e)}", exc_info=True)
-        raise
-else:
-    logger.info("Slovenian model found in resources directory")
-
-logger.info(f"Directory contents after check: {os.listdir(RESOURCES_DIR)}")
-
-# Initialize pipeline with logging
-logger.info("Initializing NLP pipeline...")
-try:
-    nlp = classla.Pipeline('sl', 
-                          processors='tokenize,pos,lemma',
-                          verbose=True)
-    logger.info("NLP pipeline initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize pipeline: {str(e)}", exc_info=True)
-    raise
+def ensure_models():
+    logger.info(f"Directory contents before check: {os.listdir(RESOURCES_DIR)}")
+
+    # Check for Slovenian model specifically
+    sl_model_path = Path(RESOURCES_DIR) / 'sl'
+    if not sl_model_path.exists():
+        logger.info("Slovenian model not found, downloading...")
+        try:
+            classla.download('sl', dir=RESOURCES_DIR)
+            logger.info("Model download completed")
+        except Exception as e:
+            logger.error(f"Error downloading model: {str(e)}", exc_info=True)
+            raise
+    else:
+        logger.info("Slovenian model found in resources directory")
+
+    logger.info(f"Directory contents after check: {os.listdir(RESOURCES_DIR)}")
+
+# The pipeline is built once in the worker's parent process, before the pool
+# forks, instead of at import where every process importing this module would
+# pay for it. Children share the loaded models copy-on-write.
+_nlp = None
+
+def get_nlp():
+    global _nlp
+    if _nlp is None:
+        ensure_models()
+
+        # Initialize pipeline with logging
+        logger.info("Initializing NLP pipeline...")
+        try:
+            _nlp = classla.Pipeline('sl',
+                                   processors='tokenize,pos,lemma',
+                                   pos_batch_size=5000,
+                                   lemma_batch_size=5000,
+                                   verbose=True)
+            logger.info("NLP pipeline initialized successfully")
+        except Exception as e:
+            logger.error(f"Failed to initialize pipeline: {str(e)}", exc_info=True)
+            raise
+    return _nlp
+
+# worker_init rather than worker_process_init: a child whose init handlers
+# run past worker_proc_alive_timeout (4s) is killed, and loading the models,
+# let alone the first download, takes longer than that
+@worker_init.connect
+def init_worker_nlp(**kwargs):
+    get_nlp()
 
 @celery_app.task(time_limit=600, soft_time_limit=540)  # Increased timeout to 10 minutes
 def process_text(text):
@@ -62,32 +86,88 @@ def process_text(text):
     try:
         # Process text
         logger.debug("Starting NLP processing...")
-        doc = nlp(text)
+        with torch.inference_mode():
+            doc = get_nlp()(text)
         logger.debug("NLP processing completed")
 
-        # Extract results
-        results = []
+        # Extract results as parallel columns; entry i of each list is word i
+        words, lemmas, tags = [], [], []
         for sent in doc.sentences:
             for word in sent.words:
-                results.append({
-                    'word': word.text,
-                    'lemma': word.lemma,
-                    'pos': word.upos
-                })
+                words.append(word.text)
+                lemmas.append(word.lemma)
+                tags.append(word.upos)
 
         processing_time = time.time() - start_time
-        logger.info(f"Processing completed in {processing_time:.2f} seconds. Words processed: {len(results)}")
-        return results
+        logger.info(f"Processing completed in {processing_time:.2f} seconds. Words processed: {len(words)}")
+        return {'words': words, 'lemmas': lemmas, 'pos': tags}
 
     except Exception as e:
         logger.error(f"Error processing text: {str(e)}", exc_info=True)
         raise
 
+SKIP_POS = frozenset({'PUNCT', 'SYM', 'SPACE'})
+
+@celery_app.task(time_limit=600, soft_time_limit=540)
+def analyze_pair(original_text, summary_text):
+    """Parse both texts and compare lemmas in one task.
+
+    Only the compact per-word columns of the summary are returned, so no
+    token lists for the original text travel through the result backend.
+    """
+    start_time = time.time()
+    logger.debug(f"Starting pair analysis. Original length: {len(original_text)}, summary length: {len(summary_text)}")
+
+    try:
+        nlp = get_nlp()
+        bulk_process = getattr(nlp, 'bulk_process', None)
+        with torch.inference_mode():
+            if bulk_process is None:
+                doc_original, doc_summary = nlp(original_text), nlp(summary_text)
+            else:
+                doc_original, doc_summary = bulk_process([
+                    classla.Document([], text=original_text),
+                    classla.Document([], text=summary_text),
+                ])
+
+        original_lemmas = {
+            word.lemma.lower()
+            for sent in doc_original.sentences
+            for word in sent.words
+            if word.upos not in SKIP_POS
+        }
+
+        words, lemmas, tags = [], [], []
+        for sent in doc_summary.sentences:
+            for word in sent.words:
+                if word.upos in SKIP_POS:
+                    continue
+                words.append(word.text)
+                lemmas.append(word.lemma.lower())
+                tags.append(word.upos)
+
+        processing_time = time.time() - start_time
+        logger.info(f"Pair analysis completed in {processing_time:.2f} seconds. Words analyzed: {len(words)}")
+        return {
+            'words': words,
+            'lemmas': lemmas,
+            'found_in_original': [lemma in original_lemmas for lemma in lemmas],
+            'pos': tags,
+        }
+
+    except Exception as e:
+        logger.error(f"Error analyzing text pair: {str(e)}", exc_info=True)
+        raise
+
 # Celery configuration optimized for large texts
 celery_app.conf.update(
     task_time_limit=600,  # 10 minutes
     task_soft_time_limit=540,
     worker_prefetch_multiplier=1,
     task_acks_late=True,
-    worker_max_memory_per_child=4000000  # 4GB
+    worker_max_memory_per_child=4000000,  # 4GB
+    # MessagePack is smaller and quicker to encode than JSON for token lists
+    task_serializer='msgpack',
+    result_serializer='msgpack',
+    accept_content=['msgpack', 'json'],
 )
\ No newline at end of file
@@ -24,6 +24,14 @@ const DEFAULT_ADVANCED_PARAMS = {
   frequencyPenalty: 0.0,
 };
 
+// Columnar /analyze-text result; entry i of each list describes word i
+const EMPTY_ANALYSIS = {
+  words: [],
+  lemmas: [],
+  found_in_original: [],
+  pos: [],
+};
+
 function ChatPage() {
   const [inputText, setInputText] = useState('');
   const [summary, setSummary] = useState('');
@@ -50,7 +58,7 @@ function ChatPage() {
   });
   const [completionTokens, setCompletionTokens] = useState(0);
   const [showHighlighting, setShowHighlighting] = useState(false);
-  const [wordAnalysis, setWordAnalysis] = useState([]);
+  const [wordAnalysis, setWordAnalysis] = useState(EMPTY_ANALYSIS);
   const [analysisLoading, setAnalysisLoading] = useState(false);
   const [analysisCache, setAnalysisCache] = useState(new Map());
   const [generationTime, setGenerationTime] = useState(null);
@@ -107,6 +115,7 @@ function ChatPage() {
       const reader = response.body.getReader();
       const decoder = new TextDecoder();
       let accumulatedSummary = '';
+      let buffer = '';
 
       while (true) {
         const { value, done } = await reader.read();
@@ -115,8 +124,10 @@ function ChatPage() {
           break;
         }
         
-        const chunk = decoder.decode(value);
-        const lines = chunk.split('\n');
+        // Reads are not aligned to SSE lines, so keep the incomplete tail
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop() || '';
         
         for (const line of lines) {
           if (line.startsWith('data: ')) {
@@ -254,13 +265,13 @@ function ChatPage() {
   };
 
   const getHighlightedText = () => {
-    if (!showHighlighting || !wordAnalysis.length) return [summary];
+    if (!showHighlighting || !wordAnalysis.words.length) return [summary];
 
     const result = [];
     let currentPos = 0;
     
-    wordAnalysis.forEach((analysis) => {
-      const word = analysis.word;
+    const { words, lemmas, found_in_original, pos: tags } = wordAnalysis;
+    words.forEach((word, i) => {
       const pos = summary.indexOf(word, currentPos);
       
       if (pos === -1) return;
@@ -269,14 +280,14 @@ function ChatPage() {
         result.push(summary.slice(currentPos, pos));
       }
       
-      const className = analysis.found_in_original 
+      const className = found_in_original[i] 
         ? 'bg-green-100 text-green-800 px-0.5 rounded' 
         : 'bg-red-100 text-red-800 px-0.5 rounded';
       
       result.push({
         props: {
           className,
-          title: `${analysis.lemma} (${analysis.pos})`,
+          title: `${lemmas[i]} (${tags[i]})`,
           children: word
         }
       });
@@ -551,7 +562,7 @@ function ChatPage() {
                     lineHeight: '1.5',
                   }}
                   dangerouslySetInnerHTML={{ __html: 
-                    wordAnalysis.length ? 
+                    wordAnalysis.words.length ? 
                       getHighlightedText().map(span => 
                         typeof span === 'string' ? span : 
                         `<span class="${span.props.className}" title="${span.props.title || ''}">${span.props.children}</span>`
@@ -60,6 +60,14 @@ function getSimilarity(str1, str2) {
   );
 }
 
+// Columnar /analyze-text result; entry i of each list describes word i
+const EMPTY_ANALYSIS = {
+  words: [],
+  lemmas: [],
+  found_in_original: [],
+  pos: [],
+};
+
 function SummaryPage() {
   const [summary, setSummary] = useState(null);
   const [currentPage, setCurrentPage] = useState(0);
@@ -67,7 +75,7 @@ function SummaryPage() {
   const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
   const [chatInput, setChatInput] = useState('');
   const [chatLoading, setChatLoading] = useState(false);
-  const [wordAnalysis, setWordAnalysis] = useState([]);
+  const [wordAnalysis, setWordAnalysis] = useState(EMPTY_ANALYSIS);
   const [showHighlighting, setShowHighlighting] = useState(false);
   const [analysisLoading, setAnalysisLoading] = useState(false);
   const [analysisCache, setAnalysisCache] = useState(new Map());
@@ -160,13 +168,13 @@ function SummaryPage() {
   };
 
   const getHighlightedText = () => {
-    if (!showHighlighting || !wordAnalysis.length) return [summary.output];
+    if (!showHighlighting || !wordAnalysis.words.length) return [summary.output];
 
     const result = [];
     let currentPos = 0;
     
-    wordAnalysis.forEach((analysis) => {
-      const word = analysis.word;
+    const { words, lemmas, found_in_original, pos: tags } = wordAnalysis;
+    words.forEach((word, i) => {
       const pos = summary.output.indexOf(word, currentPos);
       
       if (pos === -1) return; // Skip if word not found
@@ -175,14 +183,14 @@ function SummaryPage() {
         result.push(summary.output.slice(currentPos, pos));
       }
       
-      const className = analysis.found_in_original 
+      const className = found_in_original[i] 
         ? 'bg-green-100 text-green-800 px-0.5 rounded' 
         : 'bg-red-100 text-red-800 px-0.5 rounded';
       
       result.push({
         props: {
           className,
-          title: `${analysis.lemma} (${analysis.pos})`,
+          title: `${lemmas[i]} (${tags[i]})`,
           children: word
         }
       });
@@ -505,7 +513,7 @@ function SummaryPage() {
                       lineHeight: '1.5',
                     }}
                     dangerouslySetInnerHTML={{ __html: 
-                      wordAnalysis.length ? 
+                      wordAnalysis.words.length ? 
                         getHighlightedText().map(span => 
                           typeof span === 'string' ? span : 
                           `<span class="${span.props.className}" title="${span.props.title || ''}">${span.props.children}</span>`